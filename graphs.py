@@ -1,8 +1,17 @@
+import argparse
+import functools
+import itertools
+import mmap
+import multiprocessing
 import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
 import plotly.graph_objects as go
 import plotly.io as pio
-import scipy.stats
+from plotly.subplots import make_subplots
 
 # Memory issue fix
 pio.kaleido.scope.chromium_args = tuple([arg for arg in pio.kaleido.scope.chromium_args if arg != "--disable-dev-shm-usage"])
@@ -17,26 +26,111 @@ SCATTER_Y_TITLE = "Number of water molecules"
 VIOLIN_X_TITLE = "20%"
 VIOLIN_Y_TITLE = "Number of water molecules"
 
+# Image export settings, applied once to the shared kaleido scope
+# (override with PLOT_WIDTH, PLOT_HEIGHT and PLOT_FORMAT, e.g. a smaller size or
+# "svg", which skips rasterizing)
+IMAGE_WIDTH = int(os.getenv('PLOT_WIDTH', 1920))
+IMAGE_HEIGHT = int(os.getenv('PLOT_HEIGHT', 1440))
+IMAGE_FORMAT = os.getenv('PLOT_FORMAT', "png")
+pio.kaleido.scope.default_format = IMAGE_FORMAT
+pio.kaleido.scope.default_width = IMAGE_WIDTH
+pio.kaleido.scope.default_height = IMAGE_HEIGHT
+pio.kaleido.scope.default_scale = 1
+
+# Write the scatter and violin plots side by side in one image instead of two,
+# halving the number of kaleido renders (enable with PLOT_COMBINED=1)
+COMBINED_OUTPUT = os.getenv('PLOT_COMBINED', "").lower() in ("1", "true", "yes")
+COMBINED_IMAGE_WIDTH = IMAGE_WIDTH * 4 // 3
+
+# Base layouts shared by every scatter and violin plot
+SHARED_LAYOUT = dict(
+    template='seaborn', margin=dict(l=20, r=20, t=20, b=20),
+    legend=dict(
+        y=-0.1, x=0.5, font=dict(size=LEGEND_SIZE),
+        xanchor='center', yanchor='top',
+        bgcolor='rgba(0,0,0,0)', bordercolor='rgba(0,0,0,0)'
+    ),
+    yaxis=dict(
+        tickfont=dict(size=TEXT_SIZE), title_font=dict(size=TEXT_SIZE)
+    )
+)
+BASE_LAYOUT_SCATTER = dict(
+    SHARED_LAYOUT,
+    xaxis=dict(
+        title=SCATTER_X_TITLE,
+        tickfont=dict(size=TEXT_SIZE), title_font=dict(size=TEXT_SIZE)
+    )
+)
+BASE_LAYOUT_VIOLIN = dict(
+    SHARED_LAYOUT,
+    xaxis=dict(
+        title="", tickfont=dict(size=TEXT_SIZE),
+        title_font=dict(size=TEXT_SIZE), showticklabels=True
+    )
+)
+
+# Colors of the seaborn template, cycled through for the violin groups
+DEFAULT_COLORS = tuple(pio.templates['seaborn'].layout.colorway)
+
+# Maximum number of points drawn per scatter line (statistics use all points)
+MAX_SCATTER_POINTS = 2000
+
+# Maximum number of files read concurrently
+MAX_READ_WORKERS = 8
+# Maximum number of parsed files kept in memory; the least recently used are dropped
+MAX_CACHED_FILES = 32
+# Maximum number of figures serialized concurrently while writing images
+MAX_WRITE_WORKERS = 4
+# Maximum number of processes, each with its own kaleido, rendering the 'all' plots,
+# and the fewest files per process that make starting one worthwhile
+MAX_RENDER_PROCESSES = min(4, os.cpu_count() or 1)
+MIN_FILES_PER_PROCESS = 4
+
+# Answers to the interactive prompts given on the command line, used in order
+SCRIPTED_INPUT = []
+
+# Data line parsing: second, third and fourth whitespace-separated columns
+# (any ASCII whitespace but a newline separates columns)
+_LINE_RE = re.compile(rb'^[^\S\n]*\S+[^\S\n]+(\S+)[^\S\n]+(\S+)[^\S\n]+(\S+)', re.MULTILINE)
+# Line ending of old Mac files, which the line pattern does not split on
+_BARE_CR_RE = re.compile(rb'\r(?!\n)')
+# Bytes the line pattern handles as they are; what translate leaves after deleting
+# them (\x1c-\x1f, or non-ASCII text that may hold spaces such as NBSP) needs decoding
+_PLAIN_BYTES = bytes(c for c in range(128) if not 0x1c <= c <= 0x1f)
+# Whitespace str.split separates columns on, other than the line ending
+_SEPARATOR_RE = re.compile(r'[^\S\n]')
+_NON_NUMERIC = bytes(c for c in range(256) if chr(c) not in '0123456789.-')
+# Lookup table of non-numeric bytes, ignoring the NUL padding of fixed-width byte arrays
+_NON_NUMERIC_MASK = np.zeros(256, dtype=bool)
+_NON_NUMERIC_MASK[list(_NON_NUMERIC[1:])] = True
+
+# Parsed data cache, keyed by real file path and checked against mtime and size,
+# in least to most recently used order; shared by the reading threads
+_DATA_CACHE = OrderedDict()
+_DATA_CACHE_LOCK = threading.Lock()
+
+def read_input(prompt):
+    """Read the answer to a prompt, taking command line answers first"""
+    if SCRIPTED_INPUT:
+        answer = SCRIPTED_INPUT.pop(0)
+        print(f"{prompt}{answer}")
+        return answer
+    return input(prompt)
+
 class DataError(Exception):
     """Custom exception for data-related errors"""
     pass
 
-def get_selection(files, file_errors=None):
-    """Let user select files for combined plot, displaying errors in red if present."""
-    print("\nFiles:")
-    for i, f in enumerate(files, 1):
-        if file_errors and f in file_errors:
-            print(f"{i}. {f} \033[91m({file_errors[f]})\033[0m")
-        else:
-            print(f"{i}. {f}")
-    sel = input("\nEnter numbers or names separated by comma (,) for averaging or semicolon (;) for separate plots. Press enter to finish: ").strip()
-    if not sel: return None
-    if sel.lower() == 'all': return [files]  # Return as a single group
-    
-    # Split by semicolon first to get groups
-    groups = [g.strip() for g in sel.split(';')]
+def select_groups(groups, files):
+    """Resolve selection groups of numbers or names to files, or None if none match"""
     result = []
     
+    # Index files by base name once for name matching
+    base_names = [(os.path.basename(f), f) for f in files]
+    files_by_name = {}
+    for name, f in base_names:
+        files_by_name.setdefault(name, []).append(f)
+    
     for group in groups:
         if not group: continue
         
@@ -58,10 +152,10 @@ def get_selection(files, file_errors=None):
                     if not name.endswith('.txt'):
                         name += '.txt'
                     # Try exact match first
-                    matching_files = [f for f in files if os.path.basename(f) == name]
+                    matching_files = files_by_name.get(name, [])
                     if not matching_files:
                         # Try partial match
-                        matching_files = [f for f in files if name in os.path.basename(f)]
+                        matching_files = [f for base, f in base_names if name in base]
                     if matching_files:
                         selected.extend(matching_files)
                     else:
@@ -80,40 +174,21 @@ def get_selection(files, file_errors=None):
     
     return result if result else None
 
-def find_common_part(strings):
-    """Find any common part among a list of strings"""
-    if not strings: return ""
-    
-    # First try to find common prefix
-    prefix = strings[0]
-    for s in strings[1:]:
-        while not s.startswith(prefix):
-            prefix = prefix[:-1]
-            if not prefix: break
-    if prefix: return prefix
-    
-    # If no common prefix, try to find any common substring
-    shortest = min(strings, key=len)
-    for length in range(len(shortest), 0, -1):
-        for start in range(len(shortest) - length + 1):
-            candidate = shortest[start:start + length]
-            if all(candidate in s for s in strings):
-                return candidate
-    return ""
-
-def get_differing_parts(strings, common_part):
-    """Get the parts that differ between strings"""
-    if not common_part: return strings
-    
-    parts = []
-    for s in strings:
-        if common_part in s:
-            before, after = s.split(common_part, 1)
-            part = before + after
-            if part: parts.append(part)
+def get_selection(files, file_errors=None):
+    """Let user select files for combined plot, displaying errors in red if present."""
+    print("\nFiles:")
+    for i, f in enumerate(files, 1):
+        if file_errors and f in file_errors:
+            print(f"{i}. {f} \033[91m({file_errors[f]})\033[0m")
         else:
-            parts.append(s)
-    return parts
+            print(f"{i}. {f}")
+    sel = read_input("\nEnter numbers or names separated by comma (,) for averaging or semicolon (;) for separate plots. Press enter to finish: ").strip()
+    if not sel: return None
+    if sel.lower() == 'all': return [files]  # Return as a single group
+    
+    # Split by semicolon first to get groups
+    groups = [g.strip() for g in sel.split(';')]
+    return select_groups(groups, files)
 
 def find_varying_parts(files):
     """Find parts that vary between files by comparing their components"""
@@ -121,31 +196,23 @@ def find_varying_parts(files):
         return []
     
     # Split all filenames into parts
-    all_parts = []
-    for f in files:
-        base_name = os.path.splitext(os.path.basename(f))[0]
-        parts = base_name.split('_')
-        all_parts.append(parts)
-    
-    # Find positions where parts differ
-    varying_positions = set()
-    for i in range(len(all_parts[0])):
-        # Get all values at this position
-        values = [parts[i] if i < len(parts) else None for parts in all_parts]
-        # If any value is different from the first one, this position varies
-        if len(set(values)) > 1:
-            varying_positions.add(i)
-    
-    return sorted(list(varying_positions))
+    all_parts = [os.path.splitext(os.path.basename(f))[0].split('_') for f in files]
+    return find_varying_positions(all_parts)
+
+def find_varying_positions(all_parts):
+    """Find positions (within the first name's parts) where split names differ"""
+    # Compare the names column by column; missing parts count as different
+    columns = itertools.islice(itertools.zip_longest(*all_parts), len(all_parts[0]))
+    return [i for i, values in enumerate(columns) if len(set(values)) > 1]
 
 def split_filename(filename, varying_positions):
     """Split filename into parts based on varying positions"""
     # Remove extension
     base_name = os.path.splitext(os.path.basename(filename))[0]
-    
-    # Split by underscores
-    parts = base_name.split('_')
-    
+    return split_parts(base_name, base_name.split('_'), varying_positions)
+
+def split_parts(base_name, parts, varying_positions):
+    """Split a name's '_'-separated parts into prefix, varying parts and suffix"""
     if not varying_positions:
         return base_name, [], ""
     
@@ -160,33 +227,39 @@ def get_group_name(files):
     """Generate a concise, non-redundant group name for a list of files."""
     if not files:
         return ""
-    if len(files) == 1:
-        return os.path.basename(files[0])
+    return _get_group_name(tuple(os.path.basename(f) for f in files))
+
+@functools.lru_cache(maxsize=512)
+def _get_group_name(names):
+    """Cached implementation of get_group_name for a tuple of file names in their given order"""
+    if len(names) == 1:
+        return names[0]
     
-    # Get base names without extensions
-    base_names = [os.path.splitext(os.path.basename(f))[0] for f in files]
+    # Get base names without extensions, split into parts only once
+    base_names = [os.path.splitext(name)[0] for name in names]
+    all_parts = [name.split('_') for name in base_names]
     
     # Find positions where parts vary
-    varying_positions = find_varying_parts(base_names)
+    positions = find_varying_positions(all_parts)
     
-    # Split each filename into parts
-    file_parts = []
-    for name in base_names:
-        prefix, varying, suffix = split_filename(name, varying_positions)
-        file_parts.append((prefix, varying, suffix))
+    # Split each filename into prefix, varying parts and suffix
+    file_parts = [split_parts(name, parts, positions) for name, parts in zip(base_names, all_parts)]
     
     # Find common prefix and suffix
     common_prefix = file_parts[0][0]
     common_suffix = file_parts[0][2]
     
     for prefix, _, suffix in file_parts[1:]:
-        # Find common prefix
-        while not prefix.startswith(common_prefix) and common_prefix:
-            common_prefix = common_prefix.rsplit('_', 1)[0]
+        # Shrink common prefix by whole '_' parts until it is a prefix of this one
+        if not prefix.startswith(common_prefix):
+            shared = len(os.path.commonprefix([common_prefix, prefix]))
+            common_prefix = common_prefix[:max(common_prefix.rfind('_', 0, shared + 1), 0)]
         
-        # Find common suffix
-        while not suffix.endswith(common_suffix) and common_suffix:
-            common_suffix = common_suffix.split('_', 1)[1]
+        # Shrink common suffix by whole '_' parts until it is a suffix of this one
+        if not suffix.endswith(common_suffix):
+            shared = len(os.path.commonprefix([common_suffix[::-1], suffix[::-1]]))
+            cut = common_suffix.find('_', len(common_suffix) - shared - 1)
+            common_suffix = common_suffix[cut + 1:] if cut >= 0 else ""
     
     # Collect all unique varying parts
     all_varying = set()
@@ -209,123 +282,233 @@ def get_group_name(files):
     
     return '_'.join(parts)
 
-def create_output_filename(files, plot_type, is_combined=False):
-    """Create output filename based on input files and plot type, eliminating redundancy."""
-    if not files: return ""
+def get_output_base_name(files):
+    """Get the output filename stem shared by all plots of the input files"""
     if isinstance(files, list):
         if len(files) == 1 and not isinstance(files[0], list):
-            base_name = os.path.splitext(os.path.basename(files[0]))[0]
-            return f"{base_name}_{plot_type}.png"
+            return os.path.splitext(os.path.basename(files[0]))[0]
         all_files = []
         for group in files:
             if isinstance(group, list):
                 all_files.extend(group)
             else:
                 all_files.append(group)
-        group_name = get_group_name(all_files)
-        filename = f'{group_name}_{plot_type}.png'
-        return filename
+        return get_group_name(all_files)
     else:
-        base_name = os.path.splitext(os.path.basename(files))[0]
-        return f"{base_name}_{plot_type}.png"
+        return os.path.splitext(os.path.basename(files))[0]
 
-def validate_file(file_path):
-    """Validate file existence and content"""
-    if not os.path.exists(file_path):
-        raise DataError(f"File not found: {file_path}")
+def validate_file(file_path, stat=None):
+    """Validate file existence and content, returning the file's stat result"""
+    if stat is None:
+        try:
+            stat = os.stat(file_path)
+        except (OSError, ValueError):
+            raise DataError(f"File not found: {file_path}")
     
-    if os.path.getsize(file_path) == 0:
+    if stat.st_size == 0:
         raise DataError(f"File is empty: {file_path}")
     
-    return True
+    return stat
+
+def prefetch_files(files):
+    """Ask the kernel to start reading files into the page cache ahead of parsing"""
+    if not hasattr(os, 'posix_fadvise'): return
+    for file in files:
+        try:
+            fd = os.open(file, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
 
-def read_data(file):
-    """Read data from a file and return x, y values and last 20% points"""
+def mean_and_std(values):
+    """Return the mean and population standard deviation of an array"""
+    # Reuse the mean for the deviations instead of letting np.std recompute it
+    mean = values.mean(dtype=np.float64)
+    deviations = values - mean
+    return float(mean), float(np.sqrt(np.dot(deviations, deviations) / len(values)))
+
+def welch_t_tests(samples):
+    """Run Welch's t-test between each pair of adjacent samples, returning t and p arrays"""
+    # Imported here as it takes longer than the rest of the imports together,
+    # and single-file plots never need it
+    import scipy.stats
+    
+    # Every sample is reduced once, however many pairs it is part of
+    n = np.array([len(sample) for sample in samples], dtype=np.float64)
+    means = np.array([sample.mean(dtype=np.float64) for sample in samples])
+    variances = np.array([sample.var(dtype=np.float64, ddof=1) for sample in samples]) / n
+    pair_variances = variances[:-1] + variances[1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_stats = (means[:-1] - means[1:]) / np.sqrt(pair_variances)
+        df = pair_variances ** 2 / (variances[:-1] ** 2 / (n[:-1] - 1) + variances[1:] ** 2 / (n[1:] - 1))
+    p_vals = 2 * scipy.stats.t.sf(np.abs(t_stats), df)
+    # Distinct samples without spread are certainly different
+    p_vals[np.isinf(t_stats)] = 0.0
+    return t_stats, p_vals
+
+def read_data(file, stat=None):
+    """Read data from a file, serving unchanged files from the cache"""
+    stat = validate_file(file, stat)
+    # A file rewritten within the timestamp resolution usually changes size
+    version = (stat.st_mtime_ns, stat.st_size)
+    key = os.path.realpath(file)
+    with _DATA_CACHE_LOCK:
+        cached = _DATA_CACHE.get(key)
+        if cached is not None and cached[0] == version:
+            _DATA_CACHE.move_to_end(key)
+            return cached[1]
+    
+    result = parse_data(file)
+    with _DATA_CACHE_LOCK:
+        _DATA_CACHE[key] = (version, result)
+        _DATA_CACHE.move_to_end(key)
+        while len(_DATA_CACHE) > MAX_CACHED_FILES:
+            _DATA_CACHE.popitem(last=False)
+    return result
+
+def normalize_separators(data):
+    """Return data with line endings turned into newlines and other whitespace into spaces"""
+    text = data.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n')
+    return _SEPARATOR_RE.sub(' ', text).encode()
+
+def parse_data(file):
+    """Parse data from a file and return x, y values and last 20% points"""
     try:
-        validate_file(file)
-        
-        x, y = [], []
-        is_distance = False
-        with open(file, 'r') as fp:
-            lines = fp.readlines()
-            if not lines:
+        # The file is only memory-mapped, so no read buffer is needed
+        with open(file, 'rb', buffering=0) as fp:
+            if os.fstat(fp.fileno()).st_size == 0:
                 raise DataError(f"No data found in file: {file}")
-            
-            for line in lines:
-                # Split line by spaces and filter out empty strings
-                parts = [p for p in line.split() if p]
-                if len(parts) >= 4:  # Ensure we have at least 4 columns
-                    try:
-                        # Check if third column starts with 'distance'
-                        if parts[2].lower().startswith('distance'):
-                            is_distance = True
-                        # Get second and fourth columns, strip non-numeric characters
-                        x_val = float(''.join(c for c in parts[1] if c.isdigit() or c == '.' or c == '-'))
-                        y_val = float(''.join(c for c in parts[3] if c.isdigit() or c == '.' or c == '-'))
-                        x.append(x_val)
-                        y.append(y_val)
-                    except (IndexError, ValueError) as e:
-                        raise DataError(f"Invalid data format in file {file}: {str(e)}")
-        
-        if not x or not y:
+            # Scan the mapped file directly instead of copying it into memory
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    data.madvise(mmap.MADV_SEQUENTIAL)
+                # Second, third and fourth columns of every line with at least 4 columns
+                if _BARE_CR_RE.search(data) or data[:].translate(None, _PLAIN_BYTES):
+                    rows = _LINE_RE.findall(normalize_separators(data[:]))
+                else:
+                    rows = _LINE_RE.findall(data)
+        if not rows:
             raise DataError(f"No valid data points found in file: {file}")
+        columns = np.array(rows)
+        
+        # Check if third column starts with 'distance'
+        is_distance = bool(np.char.startswith(np.char.lower(columns[:, 1]), b'distance').any())
+        try:
+            # Get second and fourth columns, strip non-numeric characters
+            # (a per-token pass, only needed when such characters are present)
+            values = np.ascontiguousarray(columns[:, [0, 2]])
+            if _NON_NUMERIC_MASK[values.view(np.uint8)].any():
+                values = np.char.translate(values, None, _NON_NUMERIC)
+            values = values.astype(np.float64)
+        except ValueError as e:
+            raise DataError(f"Invalid data format in file {file}: {str(e)}")
+        x, y = np.ascontiguousarray(values.T)
+        # Whole-number counts are kept as int32, which Plotly serializes as a typed array
+        if np.array_equal(y, np.trunc(y)) and np.abs(y).max() < 2**31:
+            y = y.astype(np.int32)
         
         # Check if all values are zero
-        if all(val == 0 for val in x):
+        if not x.any():
             raise DataError("All x values are zero")
         
-        if all(val == 0 for val in y):
+        if not y.any():
             raise DataError("All y values are zero")
         
-        y_np = np.array(y)
         n_points = len(y)
         if n_points < 5:
             raise DataError(f"Not enough data points in file {file} (minimum 5 required)")
         
-        last_20_percent = round(n_points * 0.2)
+        # Nearest whole number of points to 20%, in integer arithmetic
+        last_20_percent = (n_points * 2 + 5) // 10
         if last_20_percent < 1:
             raise DataError(f"Not enough data points for 20% calculation in file {file}")
         
-        y_last = y_np[-last_20_percent:]
-        return x, y, y_last, np.mean(y_last), np.std(y_last), is_distance
+        y_last = y[-last_20_percent:]
+        return (x, y, y_last, *mean_and_std(y_last), is_distance)
     
     except IOError as e:
         raise DataError(f"Error reading file {file}: {str(e)}")
 
-def add_statistics_annotation(fig, avg, std, is_combined=False):
-    """Add statistics annotation to the plot"""
-    if is_combined:
-        stats_text = f"Average of Averages: {np.mean(avg):.2f}<br>Average of Standard Deviations: {np.mean(std):.2f}"
-    else:
-        stats_text = f"Average: {avg[0]:.2f}<br>Standard Deviation: {std[0]:.2f}"
+def warm_kaleido():
+    """Start the shared kaleido/chromium process by rendering a tiny figure"""
+    try:
+        pio.kaleido.scope.transform(go.Figure().to_plotly_json(), format=IMAGE_FORMAT, width=2, height=2)
+    except Exception:
+        # Any real problem resurfaces on the first write_image
+        pass
+
+def read_files(files, stats=None):
+    """Read files concurrently and yield (data, error) pairs in the same order"""
+    if not files: return
     
-    fig.add_annotation(
-        xref="paper", yref="paper", x=0.98, y=0.98,
-        text=stats_text, showarrow=False, font=dict(size=TEXT_SIZE),
-        align="right", bgcolor="rgba(0,0,0,0.0)", bordercolor="rgba(0,0,0,0.0)",
-        borderwidth=1, borderpad=4
-    )
+    def read_one(file, stat):
+        try:
+            return read_data(file, stat), None
+        except Exception as e:
+            return None, e
+    
+    # Results are yielded as they are consumed, so callers that only check for
+    # errors never hold every file's arrays at once
+    with ThreadPoolExecutor(max_workers=min(MAX_READ_WORKERS, len(files))) as executor:
+        yield from executor.map(read_one, files, stats or [None] * len(files))
+
+def downsample_lttb(x, y, n_out):
+    """Downsample a line to n_out points with Largest-Triangle-Three-Buckets"""
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return x, y
+    
+    xf = np.asarray(x, dtype=np.float64)
+    yf = np.asarray(y, dtype=np.float64)
+    # First and last points are kept; the rest are split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average point of the next bucket (the last point for the final bucket)
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < n_out - 1 else (n - 1, n)
+        avg_x = xf[next_start:next_end].mean()
+        avg_y = yf[next_start:next_end].mean()
+        # Keep the point forming the largest triangle with the previous kept point
+        areas = np.abs((xf[a] - avg_x) * (yf[start:end] - yf[a]) - (xf[a] - xf[start:end]) * (avg_y - yf[a]))
+        a = start + int(areas.argmax())
+        indices[i + 1] = a
+    
+    return np.asarray(x)[indices], np.asarray(y)[indices]
 
 def create_plot(files, out_file, violin_names=None):
     """Create a plot from data files and save as PNG"""
+    write_figures(build_plot(files, violin_names))
+
+def build_plot(files, violin_names=None):
+    """Build scatter and violin figures from data files, returning (figure, path, kind) jobs"""
     try:
         if not files:
             print("Error: No files provided for plotting")
-            return
+            return []
         
         # Get output directory from first file
         output_dir = os.path.dirname(files[0] if isinstance(files[0], str) else files[0][0])
         
-        # Create single figures for all groups
-        fig = go.Figure()
-        violin_fig = go.Figure()
+        # Collect the traces of all groups, each figure is built once at the end
+        scatter_traces = []
+        violin_traces = []
         
         # Track if we have any valid data to plot
         has_valid_data = False
         
-        # For combined stats
-        combined_avgs = []
-        combined_stds = []
+        # For combined stats, as running means over all files
+        n_combined = 0
+        mean_avg = 0.0
+        mean_std = 0.0
         
         # For singular stats
         singular_avg = None
@@ -333,8 +516,13 @@ def create_plot(files, out_file, violin_names=None):
         
         # Store colors for each violin
         violin_colors = []
+        # Annotations for each figure, attached in a single layout update
+        scatter_annotations = []
+        violin_annotations = []
         # Store y_last for each group for p-value calculation
         violin_y_last = []
+        # Running range of all violin data, for the y-axis
+        violin_min, violin_max = np.inf, -np.inf
         
         # Check if any file has distance data
         is_distance = False
@@ -348,128 +536,130 @@ def create_plot(files, out_file, violin_names=None):
             all_avgs, all_stds = [], []
             valid_files = []
             
-            # Process each file in the group
-            for f in group:
-                try:
-                    if not os.path.exists(f):
-                        print(f"Warning: File not found: {f}")
-                        continue
-                    x, y, y_last, avg, std, file_is_distance = read_data(f)
-                    is_distance = is_distance or file_is_distance
-                    all_data.append((x, y, y_last))
-                    all_avgs.append(avg)
-                    all_stds.append(std)
-                    valid_files.append(f)
-                except DataError as e:
-                    print(f"Warning: {str(e)} - Skipping file")
+            # Read the files in the group concurrently; missing files are
+            # reported as data errors by validate_file
+            for f, (data, error) in zip(group, read_files(group)):
+                if isinstance(error, DataError):
+                    print(f"Warning: {str(error)} - Skipping file")
                     continue
+                if error is not None:
+                    raise error
+                x, y, y_last, avg, std, file_is_distance = data
+                is_distance = is_distance or file_is_distance
+                all_data.append((x, y, y_last))
+                all_avgs.append(avg)
+                all_stds.append(std)
+                valid_files.append(f)
             if not valid_files:
                 print(f"Error: No valid files to plot in group {group_idx + 1}")
                 continue
+            # Files sampled at different x values are interpolated onto the first file's
+            # x values. np.interp needs increasing x values and holds a file's end values
+            # flat beyond its range, so only the x range every file covers is averaged.
+            x_avg = all_data[0][0]
+            x_aligned = all(np.array_equal(x_avg, d[0]) for d in all_data[1:])
+            if not x_aligned:
+                increasing = [bool((np.diff(d[0]) > 0).all()) for d in all_data]
+                for f, ok in zip(valid_files, increasing):
+                    if not ok:
+                        print(f"Warning: x values in {f} are not increasing - Skipping file")
+                valid_files = list(itertools.compress(valid_files, increasing))
+                all_data = list(itertools.compress(all_data, increasing))
+                all_avgs = list(itertools.compress(all_avgs, increasing))
+                all_stds = list(itertools.compress(all_stds, increasing))
+                if not valid_files:
+                    print(f"Error: No valid files to plot in group {group_idx + 1}")
+                    continue
+                x_avg = all_data[0][0]
+                x_start = max(d[0][0] for d in all_data)
+                x_end = min(d[0][-1] for d in all_data)
+                x_avg = x_avg[(x_avg >= x_start) & (x_avg <= x_end)]
+                if not len(x_avg):
+                    print(f"Error: Files in group {group_idx + 1} share no x range")
+                    continue
             has_valid_data = True
+            group_name = get_group_name(valid_files)
             # For combined stats
-            combined_avgs.extend(all_avgs)
-            combined_stds.extend(all_stds)
+            for avg, std in zip(all_avgs, all_stds):
+                n_combined += 1
+                mean_avg += (avg - mean_avg) / n_combined
+                mean_std += (std - mean_std) / n_combined
             # For singular stats (if only one group and one file)
             if len(files) == 1 and len(valid_files) == 1:
                 singular_avg = all_avgs[0]
                 singular_std = all_stds[0]
-            # Add scatter plot for this group
-            if len(valid_files) > 1:
-                x_avg = all_data[0][0]  # Use first file's x values
-                y_avg = np.mean([d[1] for d in all_data], axis=0)
-                group_name = get_group_name(valid_files)
-                fig.add_trace(go.Scatter(
-                    x=x_avg, y=y_avg, mode='lines',
-                    line=dict(width=1.5), name=group_name,
-                    showlegend=True
-                ))
-            else:
-                group_name = get_group_name(valid_files)
-                fig.add_trace(go.Scatter(
-                    x=all_data[0][0], y=all_data[0][1], mode='lines',
-                    line=dict(width=1.5), name=group_name,
-                    showlegend=True
-                ))
-            # Add violin plot for this group
+            # Average the group's files, or use the single file as is
             if len(valid_files) > 1:
+                # Stack all y values into one [n_files, n_points] array
+                ys = np.empty((len(all_data), len(x_avg)), dtype=np.float32)
+                for row, (x, y, _) in zip(ys, all_data):
+                    row[:] = y if x_aligned else np.interp(x_avg, x, y)
+                y_avg = ys.sum(axis=0)
+                y_avg *= 1.0 / len(ys)
+                # Violin data comes from each file's own full-precision tail
                 combined_last = np.concatenate([d[2] for d in all_data])
-                group_name = get_group_name(valid_files)
-                color = pio.templates['seaborn'].layout.colorway[group_idx % len(pio.templates['seaborn'].layout.colorway)]
-                violin_colors.append(color)
-                violin_y_last.append(combined_last)
-                violin_fig.add_trace(go.Violin(
-                    y=combined_last, name=group_name, box_visible=True,
-                    meanline_visible=True, showlegend=True,
-                    line=dict(color=color),
-                    x0=group_idx
-                ))
-                violin_fig.add_annotation(
-                    xref="x", yref="y",
-                    x=group_idx + 0.3, y=np.max(combined_last),
-                    text=f"<span style='color:{color}'>μ: {np.mean(combined_last):.2f}<br>σ: {np.std(combined_last):.2f}</span>",
-                    showarrow=False,
-                    font=dict(size=TEXT_SIZE),
-                    align="left",
-                    bgcolor="rgba(0,0,0,0.0)",
-                    bordercolor="rgba(0,0,0,0.0)",
-                    borderwidth=1,
-                    borderpad=4
-                )
+                combined_avg, combined_std = mean_and_std(combined_last)
             else:
-                group_name = get_group_name(valid_files)
-                color = pio.templates['seaborn'].layout.colorway[group_idx % len(pio.templates['seaborn'].layout.colorway)]
-                violin_colors.append(color)
-                violin_y_last.append(all_data[0][2])
-                violin_fig.add_trace(go.Violin(
-                    y=all_data[0][2], name=group_name, box_visible=True,
-                    meanline_visible=True, showlegend=True,
-                    line=dict(color=color),
-                    x0=group_idx
-                ))
-                violin_fig.add_annotation(
-                    xref="x", yref="y",
-                    x=group_idx + 0.3, y=np.max(all_data[0][2]),
-                    text=f"<span style='color:{color}'>μ: {all_avgs[0]:.2f}<br>σ: {all_stds[0]:.2f}</span>",
-                    showarrow=False,
-                    font=dict(size=TEXT_SIZE),
-                    align="left",
-                    bgcolor="rgba(0,0,0,0.0)",
-                    bordercolor="rgba(0,0,0,0.0)",
-                    borderwidth=1,
-                    borderpad=4
-                )
+                x_avg, y_avg, combined_last = all_data[0]
+                combined_avg, combined_std = all_avgs[0], all_stds[0]
+            
+            # Add scatter plot for this group
+            x_plot, y_plot = downsample_lttb(x_avg, y_avg, MAX_SCATTER_POINTS)
+            scatter_traces.append(dict(
+                type='scatter', x=x_plot, y=y_plot, mode='lines',
+                line=dict(width=1.5), name=group_name,
+                showlegend=True
+            ))
+            # Add violin plot for this group
+            color = DEFAULT_COLORS[group_idx % len(DEFAULT_COLORS)]
+            violin_colors.append(color)
+            violin_y_last.append(combined_last)
+            violin_top = float(combined_last.max())
+            violin_traces.append(dict(
+                type='violin', y=combined_last.astype(np.float32), name=group_name, box_visible=True,
+                meanline_visible=True, showlegend=True,
+                line=dict(color=color),
+                x0=group_idx
+            ))
+            violin_annotations.append(dict(
+                xref="x", yref="y",
+                x=group_idx + 0.3, y=violin_top,
+                text=f"<span style='color:{color}'>μ: {combined_avg:.2f}<br>σ: {combined_std:.2f}</span>",
+                showarrow=False,
+                font=dict(size=TEXT_SIZE),
+                align="left",
+                bgcolor="rgba(0,0,0,0.0)",
+                bordercolor="rgba(0,0,0,0.0)",
+                borderwidth=1,
+                borderpad=4
+            ))
+            violin_min = min(violin_min, float(violin_y_last[-1].min()))
+            violin_max = max(violin_max, violin_top)
         if not has_valid_data:
             print("Error: No valid data to plot. Skipping graph creation.")
-            return
+            return []
+        fig = go.Figure(data=scatter_traces)
+        violin_fig = go.Figure(data=violin_traces)
         is_combined = (isinstance(files, list) and (len(files) > 1 or (len(files) == 1 and len(files[0]) > 1)))
-        if is_combined and combined_avgs and combined_stds:
-            stats_text = f"Average of Averages: {np.mean(combined_avgs):.2f}<br>Average of Standard Deviations: {np.mean(combined_stds):.2f}"
-            for plot in [fig, violin_fig]:
-                plot.add_annotation(
-                    xref="paper", yref="paper", x=0.98, y=0.98,
-                    text=stats_text, showarrow=False, font=dict(size=TEXT_SIZE, color="black"),
-                    align="right", bgcolor="rgba(0,0,0,0.0)", bordercolor="rgba(0,0,0,0.0)",
-                    borderwidth=1, borderpad=4
-                )
+        stats_text = None
+        if is_combined and n_combined:
+            stats_text = f"Average of Averages: {mean_avg:.2f}<br>Average of Standard Deviations: {mean_std:.2f}"
         if not is_combined and singular_avg is not None and singular_std is not None:
             stats_text = f"Average: {singular_avg:.2f}<br>Standard Deviation: {singular_std:.2f}"
-            for plot in [fig, violin_fig]:
-                plot.add_annotation(
-                    xref="paper", yref="paper", x=0.98, y=0.98,
-                    text=stats_text, showarrow=False, font=dict(size=TEXT_SIZE, color="black"),
-                    align="right", bgcolor="rgba(0,0,0,0.0)", bordercolor="rgba(0,0,0,0.0)",
-                    borderwidth=1, borderpad=4
-                )
-        # After all violins are added, find the highest data point for y-axis range
-        all_violin_y = []
-        for trace in violin_fig.data:
-            if hasattr(trace, 'y'):
-                all_violin_y.extend(trace.y)
+        if stats_text:
+            stats_annotation = dict(
+                xref="paper", yref="paper", x=0.98, y=0.98,
+                text=stats_text, showarrow=False, font=dict(size=TEXT_SIZE, color="black"),
+                align="right", bgcolor="rgba(0,0,0,0.0)", bordercolor="rgba(0,0,0,0.0)",
+                borderwidth=1, borderpad=4
+            )
+            scatter_annotations.append(stats_annotation)
+            violin_annotations.append(stats_annotation)
+        # Use the range of all violin data for the y-axis
         is_combined_violin = (isinstance(files, list) and (len(files) > 1 or (len(files) == 1 and len(files[0]) > 1)))
-        if all_violin_y and is_combined_violin:
-            max_y = max(all_violin_y)
-            min_y = min(all_violin_y)
+        if violin_y_last and is_combined_violin:
+            max_y = violin_max
+            min_y = violin_min
             if is_distance:
                 yaxis_range = [max(0, min_y - min_y * 0.05), max_y + max_y * 0.05]
             else:
@@ -486,61 +676,29 @@ def create_plot(files, out_file, violin_names=None):
         
         # Update scatter plot layout
         y_title = "Distance [Å]" if is_distance else SCATTER_Y_TITLE
-        fig.update_layout(
-            template='seaborn', margin=dict(l=20, r=20, t=20, b=20),
-            legend=dict(
-                y=-0.1, x=0.5, font=dict(size=LEGEND_SIZE),
-                xanchor='center', yanchor='top',
-                bgcolor='rgba(0,0,0,0)', bordercolor='rgba(0,0,0,0)'
-            ),
-            xaxis=dict(
-                title=SCATTER_X_TITLE,
-                tickfont=dict(size=TEXT_SIZE), title_font=dict(size=TEXT_SIZE)
-            ),
-            yaxis=dict(
-                title=y_title,
-                tickfont=dict(size=TEXT_SIZE), title_font=dict(size=TEXT_SIZE)
-            )
-        )
+        fig.update_layout(BASE_LAYOUT_SCATTER, yaxis_title_text=y_title)
         
         # Update violin plot layout
-        violin_layout_kwargs = dict(
-            template='seaborn', margin=dict(l=20, r=20, t=20, b=20),
-            legend=dict(
-                y=-0.1, x=0.5, font=dict(size=LEGEND_SIZE),
-                xanchor='center', yanchor='top',
-                bgcolor='rgba(0,0,0,0)', bordercolor='rgba(0,0,0,0)'
-            ),
-            xaxis=dict(
-                title="", tickfont=dict(size=TEXT_SIZE),
-                title_font=dict(size=TEXT_SIZE), showticklabels=True,
-                ticktext=colored_ticktext,
-                tickvals=list(range(len(files)))
-            ),
-            yaxis=dict(
-                title=y_title,
-                tickfont=dict(size=TEXT_SIZE), title_font=dict(size=TEXT_SIZE)
-            )
+        violin_fig.update_layout(
+            BASE_LAYOUT_VIOLIN, yaxis_title_text=y_title,
+            xaxis_ticktext=colored_ticktext, xaxis_tickvals=list(range(len(files)))
         )
         if yaxis_range:
-            violin_layout_kwargs['yaxis']['range'] = yaxis_range
-        violin_fig.update_layout(**violin_layout_kwargs)
+            violin_fig.update_yaxes(range=yaxis_range)
 
         # --- P-VALUE ANNOTATIONS BETWEEN VIOLINS ---
         # Only if there are at least 2 violins
         if len(violin_y_last) > 1:
-            for i in range(len(violin_y_last) - 1):
-                y1 = violin_y_last[i]
-                y2 = violin_y_last[i+1]
-                # T-test
-                t_stat, p_val = scipy.stats.ttest_ind(y1, y2, equal_var=False)
+            # T-tests of all adjacent pairs at once
+            t_stats, p_vals = welch_t_tests(violin_y_last)
+            for i, (t_stat, p_val) in enumerate(zip(t_stats, p_vals)):
                 # Color: red if significant, else black; both 70% transparent
                 if p_val < 0.05:
                     color = 'rgba(255,0,0,0.7)'
                 else:
                     color = 'rgba(0,0,0,0.7)'
                 # Add p-value and t-value text below the graph
-                violin_fig.add_annotation(
+                violin_annotations.append(dict(
                     xref="paper", yref="paper",
                     x=(i + 0.5) / (len(files) - 1), y=-0.1,
                     text=f"p = {p_val:.2g}<br>t = {t_stat:.2f}",
@@ -551,22 +709,74 @@ def create_plot(files, out_file, violin_names=None):
                     bordercolor="rgba(0,0,0,0.0)",
                     borderwidth=0,
                     borderpad=2
-                )
+                ))
         # --- END P-VALUE ANNOTATIONS ---
+        
+        fig.update_layout(annotations=scatter_annotations)
+        violin_fig.update_layout(annotations=violin_annotations)
 
-        # Create output filenames
+        # Create output filenames, all sharing one base name
         all_files = [f for group in files for f in group] if isinstance(files[0], list) else files
-        scatter_out = create_output_filename(all_files, "scatter", True)
-        violin_out = create_output_filename(all_files, "violin", True)
-        scatter_out = os.path.join(output_dir, scatter_out)
-        violin_out = os.path.join(output_dir, violin_out)
-        # Save plots
-        fig.write_image(scatter_out, width=1920, height=1440, scale=1)
-        print(f'Created scatter plot: {scatter_out}')
-        violin_fig.write_image(violin_out, width=1920, height=1440, scale=1)
-        print(f'Created violin plot: {violin_out}')
+        base_name = os.path.join(output_dir, get_output_base_name(all_files))
+        if COMBINED_OUTPUT:
+            return [(combine_figures(fig, violin_fig), f"{base_name}_combined.{IMAGE_FORMAT}", "combined")]
+        scatter_out = f"{base_name}_scatter.{IMAGE_FORMAT}"
+        violin_out = f"{base_name}_violin.{IMAGE_FORMAT}"
+        return [(fig, scatter_out, "scatter"), (violin_fig, violin_out, "violin")]
     except Exception as e:
-        print(f"Error in create_plot: {str(e)}")
+        print(f"Error in build_plot: {str(e)}")
+        return []
+
+def combine_figures(fig, violin_fig):
+    """Combine a scatter and a violin figure into one figure with two subplots"""
+    combined = make_subplots(rows=1, cols=2, column_widths=[0.7, 0.3], horizontal_spacing=0.08)
+    for trace in fig.data:
+        combined.add_trace(trace, row=1, col=1)
+    # The scatter legend already names every group
+    for trace in violin_fig.data:
+        combined.add_trace(trace.update(showlegend=False), row=1, col=2)
+    
+    combined.update_layout(
+        template=fig.layout.template, margin=fig.layout.margin, legend=fig.layout.legend,
+        width=COMBINED_IMAGE_WIDTH
+    )
+    combined.update_xaxes(fig.layout.xaxis, row=1, col=1)
+    combined.update_yaxes(fig.layout.yaxis, row=1, col=1)
+    combined.update_xaxes(violin_fig.layout.xaxis, row=1, col=2)
+    combined.update_yaxes(violin_fig.layout.yaxis, row=1, col=2)
+    
+    # Move the violin annotations onto the second subplot; the statistics box is
+    # shared with the scatter figure and only shown once
+    x0, x1 = combined.layout.xaxis2.domain
+    annotations = list(fig.layout.annotations)
+    for annotation in violin_fig.layout.annotations:
+        if annotation in annotations: continue
+        if annotation.xref == "paper":
+            annotation = annotation.update(x=x0 + annotation.x * (x1 - x0))
+        else:
+            annotation = annotation.update(xref="x2", yref="y2")
+        annotations.append(annotation)
+    combined.update_layout(annotations=annotations)
+    return combined
+
+def render_files(files):
+    """Build and write individual plots for each file, for use in a worker process"""
+    write_figures([job for f in files for job in build_plot([[f]])])
+
+def write_figures(jobs):
+    """Write (figure, path, kind) jobs as images through the shared kaleido scope"""
+    if not jobs: return
+    
+    # Kaleido renders one figure at a time, but serializing the next figures
+    # overlaps with rendering the current one
+    with ThreadPoolExecutor(max_workers=min(MAX_WRITE_WORKERS, len(jobs))) as executor:
+        futures = [executor.submit(fig.write_image, path) for fig, path, _ in jobs]
+        for (_, path, kind), future in zip(jobs, futures):
+            try:
+                future.result()
+                print(f'Created {kind} plot: {path}')
+            except Exception as e:
+                print(f"Error writing {kind} plot {path}: {str(e)}")
 
 def process_selection(selection, files, file_errors):
     """Process selection string and return groups of files and their names"""
@@ -575,67 +785,52 @@ def process_selection(selection, files, file_errors):
     
     # Split by semicolon first to get groups
     groups = [g.strip() for g in selection.split(';')]
-    result = []
     
     # Ask for violin names if there are multiple groups
     violin_names = None
     if len(groups) > 1:
-        name_input = input("\nEnter names for violins (comma-separated, press Enter to use default numbers): ").strip()
+        name_input = read_input("\nEnter names for violins (comma-separated, press Enter to use default numbers): ").strip()
         if name_input:
             violin_names = [name.strip() for name in name_input.split(',')]
             if len(violin_names) != len(groups):
                 print(f"Warning: Number of names ({len(violin_names)}) doesn't match number of groups ({len(groups)}). Using default numbers.")
                 violin_names = None
     
-    for group in groups:
-        if not group: continue
-        
-        # Handle each group (comma-separated)
-        try:
-            # Try to parse as numbers first
-            selected = []
-            for x in group.split(','):
-                x = x.strip()
-                if x.isdigit():
-                    idx = int(x) - 1
-                    if 0 <= idx < len(files):
-                        selected.append(files[idx])
-                    else:
-                        print(f"Warning: Index {x} is out of range. Skipping.")
-                else:
-                    # If not a number, try to match filename
-                    name = x.strip('"\'')
-                    if not name.endswith('.txt'):
-                        name += '.txt'
-                    # Try exact match first
-                    matching_files = [f for f in files if os.path.basename(f) == name]
-                    if not matching_files:
-                        # Try partial match
-                        matching_files = [f for f in files if name in os.path.basename(f)]
-                    if matching_files:
-                        selected.extend(matching_files)
-                    else:
-                        print(f"Warning: No file found matching '{x}'. Skipping.")
-            
-            if selected:
-                result.append(selected)
-            else:
-                print(f"Warning: No valid files found in group: {group}")
-        except Exception as e:
-            err_msg = str(e)
-            if ':' in err_msg:
-                err_msg = err_msg.split(':', 1)[0].strip()
-            print(f"Error processing group '{group}': {err_msg}")
-            continue
-    
-    return (result if result else None), violin_names
+    return select_groups(groups, files), violin_names
+
+def parse_args():
+    """Parse the command line options that answer the prompts in advance"""
+    parser = argparse.ArgumentParser(description="Plot scatter and violin graphs of data files")
+    parser.add_argument('--dir', help="data directory (default: current directory)")
+    parser.add_argument('--filter', help="only use files whose names contain this text")
+    parser.add_argument('--select', help="'all' for individual plots, or numbers/names with , or ; for a combined plot; exits afterwards")
+    parser.add_argument('--names', help="comma-separated violin names for a selection with ;")
+    return parser.parse_args()
 
 def main():
     """Main program flow"""
     try:
+        args = parse_args()
+        if args.select and not (args.select.lower() == 'all' or args.select.isdigit()
+                                or ',' in args.select or ';' in args.select):
+            print(f"Error: --select '{args.select}' is not 'all', a file number, or a selection with , or ;")
+            return
+        if args.names and not (args.select and ';' in args.select):
+            print("Warning: --names is ignored without a --select containing ;")
+        if args.dir is not None or args.filter or args.select:
+            SCRIPTED_INPUT.append(args.dir or "")
+        if args.select:
+            SCRIPTED_INPUT.append(args.select)
+            if ';' in args.select:
+                SCRIPTED_INPUT.append(args.names or "")
+            SCRIPTED_INPUT.append('exit')
+        
+        # Start chromium in the background while the user is typing
+        threading.Thread(target=warm_kaleido, daemon=True).start()
+        
         current_dir = os.getcwd()
         print(f"\nCurrent directory: {current_dir}")
-        path = input("Enter data directory (press Enter to use current directory): ").strip()
+        path = read_input("Enter data directory (press Enter to use current directory): ").strip()
         path = path or current_dir
         
         if not os.path.exists(path):
@@ -644,23 +839,33 @@ def main():
         
         # Pre-validate all files and collect errors
         file_errors = {}
-        all_files = sorted([f for f in os.listdir(path) if f.endswith('.txt')])
-        if not all_files:
+        with os.scandir(path) as it:
+            entries = sorted((e for e in it if e.name.endswith('.txt') and e.is_file()), key=lambda e: e.name)
+        if not entries:
             print(f"Error: No .txt files found in {path}")
             return
+        if args.filter:
+            filter_input = args.filter.replace('*', '')
+            entries = [e for e in entries if filter_input in e.name]
+            if not entries:
+                print(f"Error: No files matching filter '{filter_input}' found in {path}")
+                return
+        all_files = [e.name for e in entries]
         
-        for f in all_files:
-            full_path = os.path.join(path, f)
+        # Directory entries cache their stat results, so validation needs no extra calls
+        full_paths = [e.path for e in entries]
+        # Full path of each file name, joined once by scandir
+        path_of = dict(zip(all_files, full_paths))
+        stats = []
+        for e in entries:
             try:
-                validate_file(full_path)
-                read_data(full_path)
-            except DataError as e:
-                err_msg = str(e)
-                if ':' in err_msg:
-                    err_msg = err_msg.split(':', 1)[0].strip()
-                file_errors[f] = err_msg
-            except Exception as e:
-                err_msg = str(e)
+                stats.append(e.stat())
+            except OSError:
+                stats.append(None)
+        prefetch_files(full_paths)
+        for f, (_, error) in zip(all_files, read_files(full_paths, stats)):
+            if error is not None:
+                err_msg = str(error)
                 if ':' in err_msg:
                     err_msg = err_msg.split(':', 1)[0].strip()
                 file_errors[f] = err_msg
@@ -679,7 +884,7 @@ def main():
                     print(f"{i}. {f}")
             
             # Get user input
-            user_input = input("\nEnter filter, 'all', 'back', 'exit', or file selection (numbers/names with , or ;): ").strip()
+            user_input = read_input("\nEnter filter, 'all', 'back', 'exit', or file selection (numbers/names with , or ;): ").strip()
             
             if not user_input or user_input.lower() == 'exit':
                 break
@@ -691,15 +896,32 @@ def main():
             if user_input.lower() == 'all':
                 # Create individual plots for all current files
                 print("\nCreating individual plots...")
+                full_paths = []
                 for f in current_files:
                     if f in file_errors:
                         print(f"Skipping {f} due to error: {file_errors[f]}")
                         continue
+                    full_paths.append(path_of[f])
+                n_processes = min(MAX_RENDER_PROCESSES, len(full_paths) // MIN_FILES_PER_PROCESS)
+                if n_processes > 1:
+                    # Kaleido renders one figure at a time, so split the files over worker
+                    # processes with a kaleido each; spawn them so they do not share the
+                    # parent's kaleido pipes
+                    chunks = [full_paths[i::n_processes] for i in range(n_processes)]
                     try:
-                        full_path = os.path.join(path, f)
-                        create_plot([[full_path]], full_path)
+                        with ProcessPoolExecutor(max_workers=n_processes, mp_context=multiprocessing.get_context('spawn')) as executor:
+                            list(executor.map(render_files, chunks))
                     except Exception as e:
-                        print(f"Error processing file {f}: {str(e)}")
+                        print(f"Error creating individual plots: {str(e)}")
+                    continue
+                jobs = []
+                for full_path in full_paths:
+                    try:
+                        jobs.extend(build_plot([[full_path]]))
+                    except Exception as e:
+                        print(f"Error processing file {os.path.basename(full_path)}: {str(e)}")
+                # Write all figures as one batch through the shared kaleido scope
+                write_figures(jobs)
                 continue
             
             # Check if input is a single number
@@ -711,7 +933,7 @@ def main():
                         print(f"Skipping {f} due to error: {file_errors[f]}")
                         continue
                     try:
-                        full_path = os.path.join(path, f)
+                        full_path = path_of[f]
                         create_plot([[full_path]], full_path)
                     except Exception as e:
                         print(f"Error processing file {f}: {str(e)}")
@@ -733,7 +955,7 @@ def main():
                                 if f in file_errors:
                                     print(f"Skipping {f} due to error: {file_errors[f]}")
                                     continue
-                                group_paths.append(os.path.join(path, f))
+                                group_paths.append(path_of[f])
                             if group_paths:
                                 selected_files.append(group_paths)
                         if selected_files: